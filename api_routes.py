@@ -1,16 +1,55 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, g
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 import time
 import logging
+import atexit
+import queue
+import threading
+from collections import Counter
 from datetime import datetime, timedelta
+from cachetools import TTLCache
+from sqlalchemy import case, func, or_, select, update
+from sqlalchemy.exc import IntegrityError
 from email_validator import EmailValidator
-from models import APIUsage, APIKey, EmailValidationResult, db
-from app import limiter
+from models import APIUsage, APIUsageDaily, APIKey, EmailValidationResult, db
+from app import app, limiter
 
 api_bp = Blueprint('api', __name__)
 email_validator = EmailValidator()
 
+# Usage records are buffered here and written in batches by a background thread;
+# if the database falls behind, records beyond USAGE_QUEUE_MAXSIZE are dropped
+USAGE_QUEUE_MAXSIZE = 10_000
+usage_queue = queue.Queue(maxsize=USAGE_QUEUE_MAXSIZE)
+USAGE_FLUSH_INTERVAL = 2  # seconds
+USAGE_FLUSH_SIZE = 500
+_usage_flush_requested = threading.Event()
+_usage_writer = None
+_usage_writer_lock = threading.Lock()
+_usage_dropped = 0
+
+# Active API keys, refreshed from the database at most once a minute
+_api_key_cache = TTLCache(maxsize=10_000, ttl=60)
+_api_key_cache_lock = threading.Lock()
+
+class CachedAPIKey:
+    """Snapshot of an active APIKey row, with a locally maintained request counter"""
+    __slots__ = ('key', 'tier', 'created_at', 'requests_today', 'last_request')
+    
+    def __init__(self, key_obj):
+        self.key = key_obj.key
+        self.tier = key_obj.tier
+        self.created_at = key_obj.created_at
+        self.requests_today = key_obj.requests_today or 0
+        self.last_request = key_obj.last_request
+
+def request_now():
+    """Current UTC time, taken once per request and reused"""
+    if 'now' not in g:
+        g.now = datetime.utcnow()
+    return g.now
+
 def get_api_key():
     """Extract API key from request headers or query parameters"""
     api_key = request.headers.get('X-API-Key') or request.args.get('api_key')
@@ -21,42 +60,176 @@ def validate_api_key(api_key):
     if not api_key:
         return None, "API key is required"
     
-    key_obj = APIKey.query.filter_by(key=api_key, is_active=True).first()
+    key_obj = get_cached_api_key(api_key)
     if not key_obj:
         return None, "Invalid API key"
     
     # Check daily rate limits based on tier
-    today = datetime.utcnow().date()
-    if key_obj.last_request and key_obj.last_request.date() != today:
-        key_obj.requests_today = 0
-    
     limits = {
         'free': 50,
         'basic': 1500,
         'premium': 6000
     }
     
-    if key_obj.requests_today >= limits.get(key_obj.tier, 100):
+    if get_requests_today(key_obj) >= limits.get(key_obj.tier, 100):
         return None, f"Rate limit exceeded for {key_obj.tier} tier"
     
     return key_obj, None
 
+def get_cached_api_key(api_key):
+    """Look up an active API key, hitting the database only on a cache miss"""
+    with _api_key_cache_lock:
+        key_obj = _api_key_cache.get(api_key)
+    if key_obj is not None:
+        return key_obj
+    
+    row = APIKey.query.filter_by(key=api_key, is_active=True).first()
+    if not row:
+        return None
+    
+    key_obj = CachedAPIKey(row)
+    with _api_key_cache_lock:
+        _api_key_cache[api_key] = key_obj
+    return key_obj
+
+def get_requests_today(key_obj):
+    """Requests made with this key today; the stored counter is stale after midnight"""
+    today = request_now().date()
+    if key_obj.last_request and key_obj.last_request.date() != today:
+        return 0
+    return key_obj.requests_today
+
+def record_api_key_usage(key_obj, count=1):
+    """Atomically add count to the key's daily counter and refresh the cached snapshot"""
+    now = request_now()
+    today_start = datetime.combine(now.date(), datetime.min.time())
+    stmt = (
+        update(APIKey)
+        .where(APIKey.key == key_obj.key)
+        .values(
+            requests_today=case(
+                (or_(APIKey.last_request.is_(None), APIKey.last_request < today_start), count),
+                else_=APIKey.requests_today + count
+            ),
+            last_request=now
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if db.engine.dialect.full_returning:
+        row = db.session.execute(stmt.returning(APIKey.requests_today, APIKey.last_request)).first()
+    else:
+        # SQLAlchemy 1.4 can't emit RETURNING for SQLite; read the row back
+        # inside the same write transaction instead
+        db.session.execute(stmt)
+        row = db.session.execute(
+            select(APIKey.requests_today, APIKey.last_request).where(APIKey.key == key_obj.key)
+        ).first()
+    db.session.commit()
+    
+    # Take the counter from the database, which includes every worker's
+    # requests, and only once the update has committed
+    with _api_key_cache_lock:
+        if row is None:
+            _api_key_cache.pop(key_obj.key, None)
+        else:
+            key_obj.requests_today, key_obj.last_request = row
+
 def log_api_usage(api_key, endpoint, response_time, status_code, email_count=1):
-    """Log API usage for analytics"""
+    """Queue API usage for analytics; it is written to the database in batches"""
+    global _usage_dropped
+    _start_usage_writer()
+    user_agent = request.headers.get('User-Agent')
+    usage = {
+        'api_key': api_key,
+        'endpoint': endpoint,
+        'timestamp': request_now(),
+        'ip_address': request.remote_addr,
+        'user_agent': user_agent[:255] if user_agent else None,
+        'response_time': response_time,
+        'status_code': status_code,
+        'email_count': email_count
+    }
     try:
-        usage = APIUsage(
-            api_key=api_key,
-            endpoint=endpoint,
-            ip_address=request.remote_addr,
-            user_agent=request.headers.get('User-Agent'),
-            response_time=response_time,
-            status_code=status_code,
-            email_count=email_count
+        usage_queue.put_nowait(usage)
+    except queue.Full:
+        with _usage_writer_lock:
+            _usage_dropped += 1
+    if usage_queue.qsize() >= USAGE_FLUSH_SIZE:
+        _usage_flush_requested.set()
+
+def flush_api_usage():
+    """Write all queued usage records in a single transaction"""
+    global _usage_dropped
+    with _usage_writer_lock:
+        dropped, _usage_dropped = _usage_dropped, 0
+    if dropped:
+        logging.warning(f"Dropped {dropped} API usage records because the usage queue was full")
+    
+    batch = []
+    while True:
+        try:
+            batch.append(usage_queue.get_nowait())
+        except queue.Empty:
+            break
+    if not batch:
+        return
+    
+    # The raw log and the daily totals are committed together so they never
+    # drift apart. A concurrent writer in another worker may create the same
+    # (key, day) total row first; if so the whole batch is retried once.
+    with app.app_context():
+        for attempt in range(2):
+            try:
+                # Core executemany: no identity map, unit of work or ORM events
+                db.session.execute(APIUsage.__table__.insert(), batch)
+                _update_usage_rollup(batch)
+                db.session.commit()
+                return
+            except IntegrityError as e:
+                db.session.rollback()
+                if attempt:
+                    logging.error(f"Failed to log API usage ({len(batch)} records): {e}")
+            except Exception as e:
+                db.session.rollback()
+                logging.error(f"Failed to log API usage ({len(batch)} records): {e}")
+                return
+
+def _update_usage_rollup(batch):
+    """Add a batch of usage records to the per-key daily totals (caller commits)"""
+    totals = Counter((usage['api_key'], usage['timestamp'].date()) for usage in batch)
+    for (api_key, day), count in totals.items():
+        updated = db.session.execute(
+            update(APIUsageDaily)
+            .where(APIUsageDaily.api_key == api_key, APIUsageDaily.day == day)
+            .values(request_count=APIUsageDaily.request_count + count)
+            .execution_options(synchronize_session=False)
         )
-        db.session.add(usage)
-        db.session.commit()
-    except Exception as e:
-        logging.error(f"Failed to log API usage: {e}")
+        if updated.rowcount == 0:
+            db.session.execute(
+                APIUsageDaily.__table__.insert().values(api_key=api_key, day=day, request_count=count)
+            )
+
+def _usage_writer_loop():
+    while True:
+        _usage_flush_requested.wait(USAGE_FLUSH_INTERVAL)
+        _usage_flush_requested.clear()
+        try:
+            flush_api_usage()
+        except Exception:
+            # Never let one failed flush stop the writer for good
+            logging.exception("API usage writer error")
+
+def _start_usage_writer():
+    """Start the background usage writer on first use (after any worker fork), or restart it if it died"""
+    global _usage_writer
+    if _usage_writer is not None and _usage_writer.is_alive():
+        return
+    with _usage_writer_lock:
+        if _usage_writer is None:
+            atexit.register(flush_api_usage)
+        if _usage_writer is None or not _usage_writer.is_alive():
+            _usage_writer = threading.Thread(target=_usage_writer_loop, name='usage-writer', daemon=True)
+            _usage_writer.start()
 
 @api_bp.route('/validate', methods=['POST'])
 @limiter.limit("10 per minute")
@@ -84,9 +257,7 @@ def validate_email():
         result = email_validator.validate(email)
         
         # Update API key usage
-        key_obj.requests_today += 1
-        key_obj.last_request = datetime.utcnow()
-        db.session.commit()
+        record_api_key_usage(key_obj, 1)
         
         # Log usage
         response_time = time.time() - start_time
@@ -133,24 +304,26 @@ def validate_bulk():
             'free': 50,
             'basic': 1500,
             'premium': 6000
-        }.get(key_obj.tier, 50) - key_obj.requests_today
+        }.get(key_obj.tier, 50) - get_requests_today(key_obj)
         
         if len(emails) > remaining_requests:
             return jsonify({'error': f'Not enough requests remaining. You have {remaining_requests} requests left.'}), 429
         
         # Validate emails
-        results = []
+        normalized = []
         for email in emails:
             if isinstance(email, str):
                 email = email.strip().lower()
                 if email:
-                    result = email_validator.validate(email)
-                    results.append(result)
+                    normalized.append(email)
+        results = []
+        total_valid = 0
+        for result in email_validator.validate_many(normalized):
+            results.append(result)
+            total_valid += result['is_valid']
         
         # Update API key usage
-        key_obj.requests_today += len(results)
-        key_obj.last_request = datetime.utcnow()
-        db.session.commit()
+        record_api_key_usage(key_obj, len(results))
         
         # Log usage
         response_time = time.time() - start_time
@@ -159,7 +332,7 @@ def validate_bulk():
         return jsonify({
             'results': results,
             'total_processed': len(results),
-            'total_valid': sum(1 for r in results if r['is_valid'])
+            'total_valid': total_valid
         }), 200
         
     except Exception as e:
@@ -189,9 +362,7 @@ def domain_reputation():
         result = email_validator.get_domain_reputation(domain)
         
         # Update API key usage
-        key_obj.requests_today += 1
-        key_obj.last_request = datetime.utcnow()
-        db.session.commit()
+        record_api_key_usage(key_obj, 1)
         
         # Log usage
         response_time = time.time() - start_time
@@ -216,17 +387,13 @@ def get_stats():
             return jsonify({'error': error}), 401
         
         # Get usage stats for this API key
-        today = datetime.utcnow().date()
+        today = request_now().date()
         week_ago = today - timedelta(days=7)
         
-        total_requests = APIUsage.query.filter_by(api_key=api_key).count()
-        today_requests = APIUsage.query.filter_by(api_key=api_key).filter(
-            APIUsage.timestamp >= datetime.combine(today, datetime.min.time())
-        ).count()
-        
-        week_requests = APIUsage.query.filter_by(api_key=api_key).filter(
-            APIUsage.timestamp >= datetime.combine(week_ago, datetime.min.time())
-        ).count()
+        total_requests, week_requests = db.session.query(
+            func.coalesce(func.sum(APIUsageDaily.request_count), 0),
+            func.coalesce(func.sum(case((APIUsageDaily.day >= week_ago, APIUsageDaily.request_count), else_=0)), 0)
+        ).filter(APIUsageDaily.api_key == api_key).one()
         
         limits = {
             'free': 50,
@@ -237,8 +404,8 @@ def get_stats():
         return jsonify({
             'tier': key_obj.tier,
             'daily_limit': limits.get(key_obj.tier, 100),
-            'requests_today': key_obj.requests_today,
-            'remaining_today': limits.get(key_obj.tier, 100) - key_obj.requests_today,
+            'requests_today': get_requests_today(key_obj),
+            'remaining_today': limits.get(key_obj.tier, 100) - get_requests_today(key_obj),
             'total_requests': total_requests,
             'requests_this_week': week_requests,
             'created_at': key_obj.created_at.isoformat()
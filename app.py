@@ -1,14 +1,15 @@
 import os
 import logging
-import threading
-import time
-import requests
+import click
+from apscheduler.schedulers.background import BackgroundScheduler
 from flask import Flask, render_template
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.pool import NullPool
 from flask_cors import CORS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from werkzeug.middleware.proxy_fix import ProxyFix
+from json_provider import ORJSONProvider
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -17,6 +18,7 @@ db = SQLAlchemy()
 
 # Create the app
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
 app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key-change-in-production")
 app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
 
@@ -24,11 +26,24 @@ app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
 CORS(app, resources={r"/api/*": {"origins": "*"}})
 
 # Configure the database
-app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL", "sqlite:///email_validator.db")
-app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-    "pool_recycle": 300,
-    "pool_pre_ping": True,
-}
+database_url = os.environ.get("DATABASE_URL", "sqlite:///email_validator.db")
+app.config["SQLALCHEMY_DATABASE_URI"] = database_url
+if os.environ.get("DATABASE_NULLPOOL"):
+    # Behind an external pooler such as PgBouncer in transaction mode
+    # (recommended on Render/Heroku), don't pool connections twice
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {"poolclass": NullPool}
+else:
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+        "pool_recycle": 300,
+        "pool_pre_ping": True,
+    }
+    if not database_url.startswith("sqlite"):
+        # The default pool of 5 is exhausted quickly by threaded workers
+        app.config["SQLALCHEMY_ENGINE_OPTIONS"].update({
+            "pool_size": 20,
+            "max_overflow": 40,
+            "pool_timeout": 5,
+        })
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
 # Initialize extensions
@@ -73,35 +88,47 @@ from api_routes import api_bp
 app.register_blueprint(api_bp, url_prefix='/api')
 
 def keep_alive():
-    """Keep the app alive by pinging it every 5 minutes"""
-    def ping_self():
-        while True:
+    """Keep pooled database connections warm with a lightweight periodic query"""
+    def ping_database():
+        with app.app_context():
             try:
-                time.sleep(300)  # Wait 5 minutes
-                # Try to ping the health endpoint
-                try:
-                    # Get the app URL from environment or use localhost for development
-                    app_url = os.environ.get('RENDER_EXTERNAL_URL', 'http://localhost:5000')
-                    response = requests.get(f"{app_url}/api/keepalive", timeout=30)
-                    if response.status_code == 200:
-                        app.logger.info("Keep-alive ping successful")
-                    else:
-                        app.logger.warning(f"Keep-alive ping failed with status: {response.status_code}")
-                except requests.exceptions.RequestException as e:
-                    app.logger.warning(f"Keep-alive ping failed: {e}")
-                except Exception as e:
-                    app.logger.error(f"Keep-alive error: {e}")
+                db.session.execute(db.text("SELECT 1"))
             except Exception as e:
-                app.logger.error(f"Keep-alive thread error: {e}")
-                time.sleep(60)  # Wait 1 minute before retrying
+                app.logger.warning(f"Keep-alive query failed: {e}")
     
-    # Start the keep-alive thread
-    ping_thread = threading.Thread(target=ping_self, daemon=True)
-    ping_thread.start()
-    app.logger.info("Keep-alive service started - pinging every 5 minutes")
+    scheduler = BackgroundScheduler(daemon=True)
+    scheduler.add_job(ping_database, 'interval', minutes=5, id='keep-alive')
+    scheduler.start()
+    app.logger.info("Keep-alive job scheduled - querying the database every 5 minutes")
+
+@app.cli.command('rebuild-usage-rollup')
+def rebuild_usage_rollup():
+    """Recompute daily usage totals from the raw usage log (safe to re-run)"""
+    import models
+    from sqlalchemy.exc import IntegrityError
+    
+    usage_day = db.func.date(models.APIUsage.timestamp)
+    try:
+        db.session.execute(models.APIUsageDaily.__table__.delete())
+        db.session.execute(
+            models.APIUsageDaily.__table__.insert().from_select(
+                ['api_key', 'day', 'request_count'],
+                db.select([models.APIUsage.api_key, usage_day, db.func.count()])
+                .where(models.APIUsage.timestamp.isnot(None))
+                .group_by(models.APIUsage.api_key, usage_day)
+            )
+        )
+        db.session.commit()
+    except IntegrityError:
+        # A usage flush from a running worker raced the rebuild
+        db.session.rollback()
+        raise click.ClickException("Usage was logged during the rebuild; run it again")
+    click.echo("Rebuilt daily usage totals")
 
 with app.app_context():
-    # Import models to ensure tables are created
+    # Import models to ensure tables are created. A new api_usage_daily table
+    # starts empty; backfill it with `flask --app app rebuild-usage-rollup`
+    # (see README "Upgrading")
     import models
     db.create_all()
     
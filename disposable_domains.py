@@ -1,5 +1,5 @@
 # List of known disposable email domains
-DISPOSABLE_DOMAINS = {
+DISPOSABLE_DOMAINS = frozenset({
     '10minutemail.com',
     '10minutemail.net',
     '20minutemail.com',
@@ -565,4 +565,4 @@ DISPOSABLE_DOMAINS = {
     'zehnminuten.de',
     'zehnminutenmail.de',
     'zoemail.net'
-}
+})
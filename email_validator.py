@@ -1,8 +1,32 @@
 import re
+import asyncio
+import threading
+import aiodns
 import dns.resolver
-import requests
 import logging
+from cachetools import TTLCache
 from disposable_domains import DISPOSABLE_DOMAINS
+from popular_domains import POPULAR_DOMAINS
+
+_EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$', re.ASCII)
+
+# Bulk DNS prefetch limits: per query (c-ares timeout/tries) and for the whole batch
+DNS_QUERY_TIMEOUT = 2.0
+DNS_QUERY_TRIES = 2
+DNS_PREFETCH_TIMEOUT = 5.0
+
+# Popular providers always have MX records and a fixed reputation, so their
+# domain-level result fields are prebuilt and no DNS lookup is needed
+_KNOWN_GOOD = {
+    domain: {
+        'is_valid': score > 0.3,
+        'mx_valid': True,
+        'is_disposable': False,
+        'domain_reputation': score
+    }
+    for domain, score in POPULAR_DOMAINS.items()
+    if domain not in DISPOSABLE_DOMAINS
+}
 
 class EmailValidator:
     def __init__(self):
@@ -11,9 +35,12 @@ class EmailValidator:
             'sales', 'marketing', 'noreply', 'no-reply', 'postmaster',
             'webmaster', 'hostmaster', 'abuse', 'security', 'root'
         }
+        # DNS answers keyed by (domain, rdtype), shared across request threads
+        self._dns_cache = TTLCache(maxsize=10_000, ttl=3600)
+        self._dns_lock = threading.RLock()
         
-    def validate(self, email):
-        """Comprehensive email validation"""
+    def validate(self, email, cached_only=False):
+        """Comprehensive email validation; cached_only skips DNS lookups not already cached"""
         result = {
             'email': email,
             'is_valid': False,
@@ -41,6 +68,13 @@ class EmailValidator:
             result['errors'].append('Invalid email format')
             return result
         
+        # Fast path for popular providers
+        known = _KNOWN_GOOD.get(result['domain'])
+        if known is not None:
+            result.update(known)
+            result['is_role_account'] = self._is_role_account(local)
+            return result
+        
         # Check if disposable
         result['is_disposable'] = self._is_disposable(domain)
         if result['is_disposable']:
@@ -50,12 +84,17 @@ class EmailValidator:
         result['is_role_account'] = self._is_role_account(local)
         
         # Validate MX records
-        result['mx_valid'] = self._validate_mx(domain)
-        if not result['mx_valid']:
+        mx_valid = self._validate_mx(domain, cached_only=cached_only)
+        result['mx_valid'] = bool(mx_valid)
+        if mx_valid is None:
+            result['errors'].append('DNS lookup failed')
+        elif not mx_valid:
             result['errors'].append('No valid MX records found')
         
-        # Get domain reputation
-        result['domain_reputation'] = self._get_domain_reputation_score(domain)
+        # Get domain reputation (reusing the MX result)
+        result['domain_reputation'] = self._get_domain_reputation_score(
+            domain, mx_valid=result['mx_valid'], cached_only=cached_only
+        )
         
         # Overall validity
         result['is_valid'] = (
@@ -67,18 +106,81 @@ class EmailValidator:
         
         return result
     
+    def validate_many(self, emails):
+        """Validate a batch of emails, yielding results in input order"""
+        # Resolve every distinct domain concurrently up front so the
+        # per-email validations below are served from the DNS cache
+        domains = {email.rsplit('@', 1)[1] for email in emails if self._validate_syntax(email)}
+        if domains:
+            try:
+                asyncio.run(self._prefetch_domains(domains))
+            except asyncio.TimeoutError:
+                logging.warning(f"DNS prefetch timed out after {DNS_PREFETCH_TIMEOUT}s")
+            except Exception as e:
+                logging.warning(f"DNS prefetch failed: {e}")
+        
+        # Only cached answers are used from here on, so the prefetch deadline
+        # bounds the DNS time of the whole batch; domains it didn't resolve
+        # are reported as failed rather than looked up one by one
+        for email in emails:
+            yield self.validate(email, cached_only=True)
+    
+    async def _prefetch_domains(self, domains):
+        """Resolve the records validate() needs for each domain on one event loop"""
+        resolver = aiodns.DNSResolver(timeout=DNS_QUERY_TIMEOUT, tries=DNS_QUERY_TRIES)
+        lookups = []
+        for domain in domains:
+            if domain.lower() in _KNOWN_GOOD:
+                continue
+            lookups.append(self._resolve_async(resolver, domain, 'MX'))
+            lookups.append(self._resolve_async(resolver, domain, 'A'))
+        await asyncio.wait_for(asyncio.gather(*lookups), DNS_PREFETCH_TIMEOUT)
+    
+    async def _resolve_async(self, resolver, domain, rdtype):
+        """Async counterpart of _resolve, filling the same cache"""
+        cache_key = (domain, rdtype)
+        with self._dns_lock:
+            if self._dns_cache.get(cache_key) is not None:
+                return
+        
+        try:
+            found = len(await resolver.query(domain, rdtype)) > 0
+        except aiodns.error.DNSError as e:
+            if e.args[0] not in (aiodns.error.ARES_ENOTFOUND, aiodns.error.ARES_ENODATA):
+                # Timeouts and server failures are transient, don't cache them
+                return
+            found = False
+        
+        with self._dns_lock:
+            self._dns_cache[cache_key] = found
+    
     def _validate_syntax(self, email):
         """Validate email syntax using regex"""
-        pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-        return re.match(pattern, email) is not None
+        return _EMAIL_RE.match(email) is not None
     
-    def _validate_mx(self, domain):
+    def _validate_mx(self, domain, cached_only=False):
         """Validate MX records for domain"""
+        return self._resolve(domain, 'MX', cached_only=cached_only)
+    
+    def _resolve(self, domain, rdtype, cached_only=False):
+        """Check whether domain has records of rdtype, caching the answer (None on a miss when cached_only)"""
+        cache_key = (domain, rdtype)
+        with self._dns_lock:
+            found = self._dns_cache.get(cache_key)
+        if found is not None or cached_only:
+            return found
+        
         try:
-            mx_records = dns.resolver.resolve(domain, 'MX')
-            return len(mx_records) > 0
-        except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer, Exception):
+            found = len(dns.resolver.resolve(domain, rdtype)) > 0
+        except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer):
+            found = False
+        except Exception:
+            # Timeouts and server failures are transient, don't cache them
             return False
+        
+        with self._dns_lock:
+            self._dns_cache[cache_key] = found
+        return found
     
     def _is_disposable(self, domain):
         """Check if domain is disposable"""
@@ -88,49 +190,39 @@ class EmailValidator:
         """Check if email is a role account"""
         return local_part.lower() in self.role_accounts
     
-    def _get_domain_reputation_score(self, domain):
-        """Calculate domain reputation score"""
+    def _get_domain_reputation_score(self, domain, mx_valid=None, cached_only=False):
+        """Calculate domain reputation score; pass mx_valid to reuse an MX lookup"""
         score = 0.5  # Base score
         
         # Check domain age and popularity (simplified)
-        popular_domains = {
-            'gmail.com': 0.95,
-            'yahoo.com': 0.90,
-            'outlook.com': 0.90,
-            'hotmail.com': 0.85,
-            'aol.com': 0.80,
-            'icloud.com': 0.85,
-            'protonmail.com': 0.80
-        }
-        
-        if domain in popular_domains:
-            score = popular_domains[domain]
+        if domain in POPULAR_DOMAINS:
+            score = POPULAR_DOMAINS[domain]
         else:
             # For other domains, check basic indicators
-            try:
-                # Check if domain has A record
-                dns.resolver.resolve(domain, 'A')
+            if self._resolve(domain, 'A', cached_only=cached_only):
                 score += 0.2
                 
                 # Check if domain has valid MX
-                if self._validate_mx(domain):
+                if mx_valid is None:
+                    mx_valid = self._validate_mx(domain, cached_only=cached_only)
+                if mx_valid:
                     score += 0.2
                 
                 # Check domain length (shorter established domains tend to be more reputable)
                 if len(domain) < 15:
                     score += 0.1
-                
-            except Exception:
+            else:
                 score -= 0.3
         
         return max(0.0, min(1.0, score))
     
     def get_domain_reputation(self, domain):
         """Get detailed domain reputation information"""
+        has_mx = self._validate_mx(domain)
         result = {
             'domain': domain,
-            'reputation_score': self._get_domain_reputation_score(domain),
-            'has_mx': self._validate_mx(domain),
+            'reputation_score': self._get_domain_reputation_score(domain, mx_valid=has_mx),
+            'has_mx': has_mx,
             'is_disposable': self._is_disposable(domain),
             'category': 'unknown'
         }
@@ -12,6 +12,12 @@ class APIUsage(db.Model):
     status_code = db.Column(db.Integer)
     email_count = db.Column(db.Integer, default=1)
 
+class APIUsageDaily(db.Model):
+    # Per-key daily request totals, kept up to date by the batched usage writer
+    api_key = db.Column(db.String(64), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    request_count = db.Column(db.Integer, nullable=False, default=0)
+
 class APIKey(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     key = db.Column(db.String(64), unique=True, nullable=False, index=True)
@@ -0,0 +1,10 @@
+# Reputation scores for well-known mailbox providers
+POPULAR_DOMAINS = {
+    'gmail.com': 0.95,
+    'yahoo.com': 0.90,
+    'outlook.com': 0.90,
+    'hotmail.com': 0.85,
+    'aol.com': 0.80,
+    'icloud.com': 0.85,
+    'protonmail.com': 0.80
+}
@@ -1,17 +1,48 @@
 from functools import wraps
+from collections import deque
 from flask import request, jsonify
-from datetime import datetime, timedelta
 import redis
 import os
 import logging
+import threading
+import time
+import uuid
+
+# Fixed-window counter: INCRBY, starting the window's expiry on its first hit
+FIXED_WINDOW_SCRIPT = """
+local current = redis.call('INCRBY', KEYS[1], ARGV[1])
+if tonumber(current) == tonumber(ARGV[1]) then
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return current
+"""
+
+# Sliding-window log: one sorted-set entry per request, scored by Redis server
+# time so every worker agrees on the window
+SLIDING_WINDOW_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000000 + tonumber(time[2])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], 0, now - tonumber(ARGV[1]) * 1000000)
+redis.call('ZADD', KEYS[1], now, ARGV[2])
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+return redis.call('ZCARD', KEYS[1])
+"""
+
+# Number of locks the in-memory limiter stripes its keys across
+MEMORY_LOCK_STRIPES = 16
 
 class RateLimiter:
     def __init__(self):
+        # 'fixed' (default) counts per window; 'sliding' keeps an exact rolling window in Redis
+        self.sliding = os.environ.get('RATE_LIMIT_STRATEGY', 'fixed') == 'sliding'
+        
         # Try to connect to Redis, fallback to in-memory storage
         try:
             redis_url = os.environ.get('REDIS_URL')
             if redis_url:
                 self.redis_client = redis.from_url(redis_url)
+                self._fixed_window = self.redis_client.register_script(FIXED_WINDOW_SCRIPT)
+                self._sliding_window = self.redis_client.register_script(SLIDING_WINDOW_SCRIPT)
                 self.use_redis = True
             else:
                 self.use_redis = False
@@ -20,6 +51,7 @@ class RateLimiter:
             logging.warning(f"Redis not available, using memory storage: {e}")
             self.use_redis = False
             self.memory_storage = {}
+        self._memory_locks = [threading.Lock() for _ in range(MEMORY_LOCK_STRIPES)]
     
     def limit(self, key, limit, window=3600):
         """
@@ -28,56 +60,42 @@ class RateLimiter:
         limit: number of requests allowed
         window: time window in seconds (default 1 hour)
         """
-        now = datetime.utcnow()
-        
         if self.use_redis:
-            return self._redis_limit(key, limit, window, now)
+            return self._redis_limit(key, limit, window)
         else:
-            return self._memory_limit(key, limit, window, now)
+            return self._memory_limit(key, limit, window)
     
-    def _redis_limit(self, key, limit, window, now):
-        """Redis-based rate limiting"""
+    def _redis_limit(self, key, limit, window):
+        """Redis-based rate limiting (one round trip)"""
         try:
-            pipe = self.redis_client.pipeline()
-            window_start = now - timedelta(seconds=window)
-            
-            # Remove old entries
-            pipe.zremrangebyscore(f"rate_limit:{key}", 0, window_start.timestamp())
-            
-            # Count current requests
-            pipe.zcard(f"rate_limit:{key}")
-            
-            # Add current request
-            pipe.zadd(f"rate_limit:{key}", {str(now.timestamp()): now.timestamp()})
-            
-            # Set expiry
-            pipe.expire(f"rate_limit:{key}", window)
-            
-            results = pipe.execute()
-            current_count = results[1] + 1  # +1 for the request we just added
-            
+            if self.sliding:
+                current_count = self._sliding_window(keys=[f"rl:sliding:{key}"], args=[window, uuid.uuid4().hex])
+            else:
+                current_count = self._fixed_window(keys=[f"rl:{key}"], args=[1, window])
             return current_count <= limit, current_count, limit
             
         except Exception as e:
             logging.error(f"Redis rate limiting error: {e}")
             return True, 0, limit  # Allow on error
     
-    def _memory_limit(self, key, limit, window, now):
+    def _memory_limit(self, key, limit, window):
         """Memory-based rate limiting"""
-        if key not in self.memory_storage:
-            self.memory_storage[key] = []
+        now = time.monotonic()
+        window_start = now - window
         
-        # Remove old entries
-        window_start = now - timedelta(seconds=window)
-        self.memory_storage[key] = [
-            timestamp for timestamp in self.memory_storage[key]
-            if timestamp > window_start
-        ]
-        
-        # Add current request
-        self.memory_storage[key].append(now)
+        with self._memory_locks[hash(key) % MEMORY_LOCK_STRIPES]:
+            timestamps = self.memory_storage.get(key)
+            if timestamps is None:
+                timestamps = self.memory_storage[key] = deque()
+            
+            # Remove old entries; timestamps are appended in order
+            while timestamps and timestamps[0] <= window_start:
+                timestamps.popleft()
+            
+            # Add current request
+            timestamps.append(now)
+            current_count = len(timestamps)
         
-        current_count = len(self.memory_storage[key])
         return current_count <= limit, current_count, limit
 
 # Global rate limiter instance